@@ -22,21 +22,27 @@ for i in range(5,35,5):
 
 '''
 
-tp = TextPad(1024, 80, 20, 20, 10, 20)
+# attrs used by the demo, made once instead of a new list per call
+YELLOW = [ScreenMethod.FG_YELLOW]
+BLUE = [ScreenMethod.FG_BLUE]
+MAGENTA = [ScreenMethod.FG_MAGENTA]
+WHITE = [ScreenMethod.FG_WHITE]
 
-ScreenMethod.cursorOff()
-ScreenMethod.echoOff()
+tp = TextPad(1024, 80, 20, 20, 10, 20)
 
-ScreenMethod.clearScreen()
+ScreenMethod.apply(cursor_off=True, echo_off=True, clear=True)
 #tp.disableLineWrap()
 
-for i in range(1,10):
-	tp.write('this {}'.format(i), 0, 1, [33])
-	tp.print(' is a way too long test line', 0, 0, [37])
-for i in range(10,20):
-	tp.write('test line {} is another long long long long example'.format(i), i, 5, [34])
-for i in range(20,40):
-	tp.write('line {} is for 35 example'.format(i), i, 3, [35])
+lines = ['this {}'.format(i) for i in range(1,10)]
+for s in lines:
+	tp.write(s, 0, 1, YELLOW)
+	tp.print(' is a way too long test line', 0, 0, WHITE)
+lines = ['test line {} is another long long long long example'.format(i) for i in range(10,20)]
+for i, s in enumerate(lines, 10):
+	tp.write(s, i, 5, BLUE)
+lines = ['line {} is for 35 example'.format(i) for i in range(20,40)]
+for i, s in enumerate(lines, 20):
+	tp.write(s, i, 3, MAGENTA)
 
 tp.flush()
 
@@ -47,10 +53,9 @@ tp.page.setCurrentPage(2)
 
 tp.flush()
 
-for _ in range(5):
+positions = [(random.randrange(1,10), random.randrange(1,20)) for _ in range(5)]
+for x, y in positions:
 	tp.clearWindow()
-	x = random.randrange(1,10)
-	y = random.randrange(1,20)
 	tp.moveWindow(x,y)
 	time.sleep(1)
 
@@ -63,10 +68,9 @@ for i in range(20, 40, 5):
 
 tp.enableFullScreen()
 tp.page.setCurrentPage(1)
-for _ in range(3):
+positions = [(random.randrange(1,10), random.randrange(1,10)) for _ in range(3)]
+for x, y in positions:
 	tp.clearWindow()
-	x = random.randrange(1,10)
-	y = random.randrange(1,10)
 	tp.movePad(x,y)
 	time.sleep(1)
 
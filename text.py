@@ -1,15 +1,15 @@
 from textscreen import ScreenMethod, TextScreen
 import time
 
+EXIT_KEYS = frozenset((0x1b, ord('q'), ord('Q')))	# ESCAPE, q or Q
+
 class myScreen(TextScreen):
 	def __init__(self):
 		TextScreen.__init__(self)
 		self.initScreen()
 
 	def initScreen(self):
-		ScreenMethod.echoOff()
-		ScreenMethod.cursorOff()
-		ScreenMethod.clearScreen()
+		ScreenMethod.apply(cursor_off=True, echo_off=True, clear=True)
 
 
 myscr = myScreen()
@@ -24,5 +24,5 @@ myscr.flush()
 
 while True:
 	key = ScreenMethod.getKey()
-	if key == 0x1b or key == ord('q') or key == ord('Q'):
+	if key in EXIT_KEYS:
 		break
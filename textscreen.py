@@ -1,6 +1,10 @@
 ''' Full screen rich text manipulation on Linux terminal
 '''
-import os, sys, syslog, termios, struct, math
+import os, sys, logging, termios, contextlib, select, signal, threading, collections
+
+# silent unless the application configures logging
+_log = logging.getLogger('textscreen')
+_log.addHandler(logging.NullHandler())
 
 class ReadStream(object):
 	''' Set stream(stdin) for read in nocanonical mode and get key input 
@@ -82,6 +86,16 @@ class ReadStream(object):
 	KEY_SHIFT_F3 = b'\x1b[1;2R'
 	KEY_SHIFT_F4 = b'\x1b[1;2S'
 
+	# trie of key sequences, { byte : { byte : ... } }, where a key 
+	# sequence ends at a node with None in it
+	KEY_TRIE = {}
+	for _key in [v for k, v in locals().items() if k.startswith('KEY_') and isinstance(v, bytes)]:
+		_node = KEY_TRIE
+		for _byte in _key:
+			_node = _node.setdefault(_byte, {})
+		_node[None] = True
+	del _key, _node, _byte
+
 	def __init__(self, read_size=6, vmin=1, vtime=0, stream=None):
 		''' set stream(stdin) for read in noncanonical mode, no echo, 
 		Suggested:
@@ -148,17 +162,37 @@ class ReadStream(object):
 		return(key)
 
 class Pagination(object):
+	''' Split items into pages of items_per_page, both items and pages 
+	are numbered from 1
+
+	Example:
+		>>> p = Pagination(10, 25)
+		>>> p.totalPages(), p.pageItems(), p.previousPage(), p.nextPage()
+		(3, [1, 10], 0, 2)
+		>>> p.setCurrentPage(3), p.pageItems(), p.previousPage(), p.nextPage()
+		(True, [21, 25], 2, 0)
+		>>> p.setCurrentPage(4), p.currentPage()
+		(False, 3)
+		>>> p.setTotalItems(30), p.pageItems(), p.nextPage()
+		(True, [21, 30], 0)
+		>>> p.setCurrentPage(2), p.pageItems(), p.previousPage(), p.nextPage()
+		(True, [11, 20], 1, 3)
+	'''
+
 	def __init__(self, items_per_page, total_items=0):
 		self._items_per_page = items_per_page if items_per_page and items_per_page > 0 else 1
 		self._total_items = total_items if total_items and total_items > 0 else 0
 		self._current_page = 1
-		self._total_pages = math.ceil(self._total_items / self._items_per_page)
+		self._page_base = 0	# items before current page, refer to pageItems
+		self._total_pages = -(-self._total_items // self._items_per_page)
 
 	def setCurrentPage(self, page):
 		''' set current page to 'page'
 		'''
-		if page and page > 0 and (not self._total_items or page <= self._total_pages):
+		# _total_pages is 0 only if there is no total_items, then any page goes
+		if page and 0 < page <= (self._total_pages or page):
 			self._current_page = page
+			self._page_base = (page - 1) * self._items_per_page
 			return(True)
 		else:
 			return(False)	
@@ -169,8 +203,9 @@ class Pagination(object):
 		if not items_per_page or items_per_page < 1:
 			return(False)
 		self._items_per_page = items_per_page
-		self._total_pages = math.ceil(self._total_items / self._items_per_page)
+		self._total_pages = -(-self._total_items // self._items_per_page)
 		self._current_page = 1 if reset_current_page or self._current_page < self._total_pages else self._current_page
+		self._page_base = (self._current_page - 1) * self._items_per_page
 		return(True)
 
 	def setTotalItems(self, total_items, reset_current_page=False):
@@ -179,8 +214,9 @@ class Pagination(object):
 		if not total_items or total_items < 1:
 			return(False)
 		self._total_items = total_items
-		self._total_pages = math.ceil(self._total_items / self._items_per_page)
+		self._total_pages = -(-self._total_items // self._items_per_page)
 		self._current_page = 1 if reset_current_page or self._current_page < self._total_pages else self._current_page
+		self._page_base = (self._current_page - 1) * self._items_per_page
 		return(True)
 
 	def totalItems(self):
@@ -208,7 +244,7 @@ class Pagination(object):
 		''' Get previous page number
 		Return: self._current_page - 1 or 0 if no previous page
 		'''
-		return(self._currentPage - 1)
+		return(self._current_page - 1)
 
 	def firstPage(self):
 		''' Return the first page number, now always 1
@@ -224,9 +260,8 @@ class Pagination(object):
 	def pageItems(self):
 		''' get a list of [begin_item_number, end_item_number]
 		'''
-		begin = (self._current_page - 1) * self._items_per_page + 1
-		end = (begin + self._items_per_page - 1) if self._current_page < self._total_page or not self._total_items else self._total_items 
-		return([begin, end])
+		end = self._page_base + self._items_per_page
+		return([self._page_base + 1, min(end, self._total_items or end)])
 
 class ScreenMethod(object):
 	''' Full screen and rich text (color + position) manipulation
@@ -292,6 +327,20 @@ class ScreenMethod(object):
 	var_SCROLL_SCREEN = '\x1b[{};{}r' 	# (row, column) expected
 	var_SET_ATTRS = '\x1b[{}m'		# expects color(list(attrs))
 
+	''' printf style of the above, for example:
+		fmt_CURSOR_AT % (r,c)
+	is the same as var_CURSOR_AT.format(r,c) but runs faster as it
+	does not go through the format mini-language
+	'''
+	fmt_CURSOR_HOME = '\x1b[%s;%sH'
+	fmt_CURSOR_UP = '\x1b[%sA'
+	fmt_CURSOR_DOWN = '\x1b[%sB'
+	fmt_CURSOR_FORWARD = '\x1b[%sC'
+	fmt_CURSOR_BACKWARD = '\x1b[%sD'
+	fmt_CURSOR_AT = '\x1b[%s;%sf'
+	fmt_SCROLL_SCREEN = '\x1b[%s;%sr'
+	fmt_SET_ATTRS = '\x1b[%sm'
+
 	''' Display Attributes
 		<ESC>[{attr1};...;{attrn}m
 	'''
@@ -356,6 +405,93 @@ class ScreenMethod(object):
 	BG_CYAN = 46
 	BG_WHITE = 47
 	BG_RESET = 49
+
+	_batch = None	# pending output in batch mode, refer to batch
+	WRITEV_MAX = 1024	# buffers per os.writev, IOV_MAX of Linux
+	_stdout = (None, None)	# sys.stdout and its fd, None if it has none
+	_keys = b''	# key strokes read but not taken yet, refer to getKey
+	_screenSerial = 0	# changes whenever screen content may be changed
+	_size = None	# (row, column) known until SIGWINCH, refer to getSize
+	_sizeHandler = None	# our SIGWINCH handler, False if it can't be ours
+
+	@staticmethod
+	def _emit(text, touch=False):
+		''' Output text to screen right away, or hold it until the end of
+		the batch if it is in batch mode
+		Set touch if the text changes screen content other than by 
+		positional text, so that windows know to redraw everything 
+		'''
+		if touch:
+			ScreenMethod._screenSerial += 1
+		if ScreenMethod._batch is None:
+			ScreenMethod._writeOut(text)
+		else:
+			ScreenMethod._batch.append(text)
+
+	@staticmethod
+	def _writeOut(*texts):
+		''' Write texts to stdout by os.write, which goes around the text
+		layer of sys.stdout (lock, newline and encoding per write). Text 
+		pending in sys.stdout is flushed first to keep things in order
+		More than one texts are written by os.writev if there is, so
+		that they need not be joined first
+		If sys.stdout has no file descriptor (ie. io.StringIO), texts
+		are written to it as they used to be
+		'''
+		stdout = sys.stdout
+		stdout.flush()
+		if ScreenMethod._stdout[0] is not stdout:	# first time or replaced
+			try:
+				fd = stdout.fileno()
+			except (AttributeError, OSError, ValueError):
+				fd = None
+			ScreenMethod._stdout = (stdout, fd)
+		fd = ScreenMethod._stdout[1]
+		if fd is None:
+			stdout.write(''.join(texts))
+			stdout.flush()
+			return
+		encoding = stdout.encoding or 'utf-8'
+		errors = getattr(stdout, 'errors', None) or 'strict'	# as sys.stdout.write would
+		if len(texts) > 1 and hasattr(os, 'writev'):
+			data = [memoryview(text.encode(encoding, errors)) for text in texts]
+			i = 0
+			while i < len(data):
+				n = os.writev(fd, data[i:i + ScreenMethod.WRITEV_MAX])
+				while n and i < len(data):	# drop what is written
+					if n >= len(data[i]):
+						n -= len(data[i])
+						i += 1
+					else:
+						data[i] = data[i][n:]
+						n = 0
+			return
+		data = memoryview(''.join(texts).encode(encoding, errors))
+		while data:
+			data = data[os.write(fd, data):]
+
+	@staticmethod
+	@contextlib.contextmanager
+	def batch():
+		''' Collect the output of ScreenMethod calls and send it to screen
+		by one write when the block ends, instead of one write each
+
+		Example:
+			with ScreenMethod.batch():
+				ScreenMethod.cursorOff()
+				ScreenMethod.clearScreen()
+		'''
+		if ScreenMethod._batch is not None:	# nested, outer one writes
+			yield
+			return
+		ScreenMethod._batch = []
+		try:
+			yield
+		finally:
+			texts, ScreenMethod._batch = ScreenMethod._batch, None
+			texts = [text for text in texts if text]
+			if texts:
+				ScreenMethod._writeOut(*texts)
 	
 	@staticmethod
 	def getSize():
@@ -371,36 +507,84 @@ class ScreenMethod(object):
 		rc = struct.unpack('hh', fcntl.ioctl(sys.stdout.fileno(), termios.TIOCGWINSZ, '1234'))
 		return([int(rc[0]), int(rc[1])])
 		'''
+		size = ScreenMethod._size
+		if size is not None:
+			# it holds only while our handler is there to drop it
+			if signal.getsignal(signal.SIGWINCH) is ScreenMethod._sizeHandler:
+				return(size)
+			# replaced by someone else, query every time from now on
+			ScreenMethod._size = None
+			ScreenMethod._sizeHandler = False
 		rc = os.get_terminal_size(sys.stdout.fileno())
+		# keep the size only if a resize can tell us to query it again
+		if ScreenMethod._sizeHandler is None:
+			ScreenMethod._watchSize()
+		if ScreenMethod._sizeHandler:
+			ScreenMethod._size = (rc.lines, rc.columns)
 		return(rc.lines, rc.columns)
 
+	@staticmethod
+	def _watchSize():
+		''' Install a SIGWINCH handler dropping the known size, chained to
+		the handler found.  Signal handlers can be set in the main thread 
+		only, it is tried again later if called in another thread
+			return: True if installed
+		'''
+		if threading.current_thread() is not threading.main_thread():
+			return(False)
+		previous = signal.getsignal(signal.SIGWINCH)
+		def resized(signum, frame):
+			ScreenMethod._size = None
+			if callable(previous):
+				previous(signum, frame)
+		try:
+			signal.signal(signal.SIGWINCH, resized)
+		except (ValueError, OSError) as e:
+			_log.warning('Can not watch SIGWINCH: %s', e)
+			ScreenMethod._sizeHandler = False
+			return(False)
+		ScreenMethod._sizeHandler = resized
+		return(True)
+
+	_cursorAtCache = {}	# { (row, column) : var_CURSOR_AT formatted }
+	CURSOR_AT_CACHE_SIZE = 4096
+
+	@staticmethod
+	def _cursorAt(row, column):
+		''' Get var_CURSOR_AT for (row, column), which is formatted only
+		once for the same position and reused later on
+		'''
+		key = (row, column)
+		text = ScreenMethod._cursorAtCache.get(key)
+		if text is None:
+			if len(ScreenMethod._cursorAtCache) >= ScreenMethod.CURSOR_AT_CACHE_SIZE:
+				ScreenMethod._cursorAtCache.clear()
+			text = ScreenMethod._cursorAtCache[key] = ScreenMethod.fmt_CURSOR_AT % (row, column)
+		return(text)
+
 	@staticmethod
 	def cursorOn():
 		''' show cursor refer to 'setterm -cursor on'
 		'''
-		sys.stdout.write(ScreenMethod.CURSOR_ON)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.CURSOR_ON)
 
 	@staticmethod
 	def cursorOff():
 		''' hide cursor refer to 'setterm -cursor off'
 		'''
-		sys.stdout.write(ScreenMethod.CURSOR_OFF)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.CURSOR_OFF)
 
 	@staticmethod
 	def saveScreen():
 		''' save current screen content for restoreScreen
 		'''
-		sys.stdout.write(ScreenMethod.SAVE_SCREEN)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.SAVE_SCREEN, True)
 
 	@staticmethod
 	def restoreScreen():
 		''' restore screen to the last saved one by saveScreen
 		'''
-		sys.stdout.write(ScreenMethod.RESTORE_SCREEN)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.RESTORE_SCREEN, True)
 
 	@staticmethod
 	def getTermAttrs():
@@ -415,21 +599,29 @@ class ScreenMethod(object):
 		if attrs:
 			termios.tcsetattr(sys.stdout.fileno(), termios.TCSANOW, attrs)
 
+	@staticmethod
+	def _setEcho(on):
+		''' Turn echo on or off, other attributes are kept as they are now,
+		as they may be changed by others (ie. tty.setraw, stty)
+		'''
+		attrs = ScreenMethod.getTermAttrs()
+		if on:
+			attrs[3] |= termios.ECHO
+		else:
+			attrs[3] &= ~termios.ECHO
+		termios.tcsetattr(sys.stdout.fileno(), termios.TCSANOW, attrs)
+
 	@staticmethod
 	def echoOn():
 		''' Enable echo when key in, refer to 'stty echo'
 		'''
-		attrs = ScreenMethod.getTermAttrs()
-		attrs[3] |= termios.ECHO
-		ScreenMethod.setTermAttrs(attrs)
+		ScreenMethod._setEcho(True)
 
 	@staticmethod
 	def echoOff():
 		''' disable echo when key in, refer to 'stty -echo'
 		'''
-		attrs = ScreenMethod.getTermAttrs()
-		attrs[3] &= ~termios.ECHO
-		ScreenMethod.setTermAttrs(attrs)
+		ScreenMethod._setEcho(False)
 
 	@staticmethod
 	def flushInput():
@@ -441,219 +633,211 @@ class ScreenMethod(object):
 	def clearScreen():
 		''' clear screen
 		'''
-		sys.stdout.write(ScreenMethod.ERASE_SCREEN + ScreenMethod.CURSOR_HOME)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.ERASE_SCREEN + ScreenMethod.CURSOR_HOME, True)
+
+	@staticmethod
+	def apply(cursor_off=False, echo_off=False, clear=False):
+		''' Set up screen by one terminal attributes change and one write,
+		instead of calling echoOff, cursorOff and clearScreen one by one
+
+		Example:
+			ScreenMethod.apply(cursor_off=True, echo_off=True, clear=True)
+		'''
+		if echo_off:
+			ScreenMethod.echoOff()
+		with ScreenMethod.batch():
+			if cursor_off:
+				ScreenMethod.cursorOff()
+			if clear:
+				ScreenMethod.clearScreen()
 
 	@staticmethod
 	def resetDevice():
 		''' Reset all terminal settings to default
 		'''
-		sys.stdout.write(ScreenMethod.RESET_DEVICE)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.RESET_DEVICE, True)
 
 	@staticmethod
 	def enableLineWrap():
 		''' Text wraps to next line if longer than the length of the display area
 		'''
-		sys.stdout.write(ScreenMethod.ENABLE_LINE_WRAP)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.ENABLE_LINE_WRAP)
 
 	@staticmethod
 	def disableLineWrap():
 		''' Disable line wrapping
 		'''
-		sys.stdout.write(ScreenMethod.DISABLE_LINE_WRAP)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.DISABLE_LINE_WRAP)
 
 	@staticmethod
 	def setDefaultFont():
 		''' Set the default font
 		'''
-		sys.stdout.write(ScreenMethod.DEFAULT_FONT)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.DEFAULT_FONT)
 
 	@staticmethod
 	def setAlternateFont():
 		''' Set the alternate font
 		'''
-		sys.stdout.write(ScreenMethod.ALTERNATE_FONT)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.ALTERNATE_FONT)
 
 	@staticmethod
 	def cursorHome(row=None, column=None):
 		''' Set the cursor position where subsequent text will begin. 
 		'''
-		sys.stdout.write(ScreenMethod.var_CURSOR_HOME.format(row, column) if row and column else ScreenMethod.CURSOR_HOME)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.fmt_CURSOR_HOME % (row, column) if row and column else ScreenMethod.CURSOR_HOME)
 
 	@staticmethod
 	def cursorUp(count=1):
 		''' Move the cursor up by count rows
 		'''
-		sys.stdout.write(ScreenMethod.var_CURSOR_UP.format(count))
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.fmt_CURSOR_UP % (count,))
 		
 	@staticmethod
 	def cursorDown(count=1):
 		''' Move the cursor down by count rows
 		'''
-		sys.stdout.write(ScreenMethod.var_CURSOR_DOWN.format(count))
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.fmt_CURSOR_DOWN % (count,))
 		
 	@staticmethod
 	def cursorForward(count=1):
 		''' Move the cursor forward by count columns
 		'''
-		sys.stdout.write(ScreenMethod.var_CURSOR_FORWARD.format(count))
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.fmt_CURSOR_FORWARD % (count,))
 		
 	@staticmethod
 	def cursorBackward(count=1):
 		''' Move the cursor backward by count columns
 		'''
-		sys.stdout.write(ScreenMethod.var_CURSOR_BACKWARD.format(count))
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.fmt_CURSOR_BACKWARD % (count,))
 		
 	@staticmethod
 	def moveCursor(row, column):
 		''' Move cursor 
 		'''
 		if row and column:
-			sys.stdout.write(ScreenMethod.var_CURSOR_AT.format(row, column))
-			sys.stdout.flush()
+			ScreenMethod._emit(ScreenMethod._cursorAt(row, column))
 
 	@staticmethod
 	def saveCursor():
 		''' Save current cursor position
 		'''
-		sys.stdout.write(ScreenMethod.SAVE_CURSOR)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.SAVE_CURSOR)
 
 	@staticmethod
 	def restoreCursor():
 		''' Restores cursor position after a save cursor
 		'''
-		sys.stdout.write(ScreenMethod.UNSAVE_CURSOR)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.UNSAVE_CURSOR)
 
 	@staticmethod
 	def saveCursorAttrs():
 		''' Save current cursor position and attributes
 		'''
-		sys.stdout.write(ScreenMethod.SAVE_CURSOR_ATTRS)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.SAVE_CURSOR_ATTRS)
 
 	@staticmethod
 	def restoreCursorAttrs():
 		''' Restores cursor position and attributes after a save cursor
 		'''
-		sys.stdout.write(ScreenMethod.RESTORE_CURSOR_ATTRS)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.RESTORE_CURSOR_ATTRS)
 
 	@staticmethod
 	def scrollScreen(row_start=None, row_end=None):
 		''' Enable scrolling from row {start} to row {end}
 		'''
-		if row_start and row_end:
-			sys.stdout.write(ScreenMethod.var_SCROLL_SCREEN.format(row_start, row_end))
-		else:
-			sys.stdout.write(ScreenMethod.SCROLL_SCREEN)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.fmt_SCROLL_SCREEN % (row_start, row_end) if row_start and row_end else ScreenMethod.SCROLL_SCREEN)
 
 	@staticmethod
 	def scrollDown():
 		''' Scroll display down one line
 		'''
-		sys.stdout.write(ScreenMethod.SCROLL_DOWN)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.SCROLL_DOWN, True)
 
 	@staticmethod
 	def scrollUp():
 		''' Scroll display up one line
 		'''
-		sys.stdout.write(ScreenMethod.SCROLL_UP)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.SCROLL_UP, True)
 
 	@staticmethod
 	def setTab():
 		''' Sets a tab at the current position
 		'''
-		sys.stdout.write(ScreenMethod.SET_TAB)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.SET_TAB)
 
 	@staticmethod
 	def clearTab():
 		''' Clears tab at the current position
 		'''
-		sys.stdout.write(ScreenMethod.CLEAR_TAB)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.CLEAR_TAB)
 
 	@staticmethod
 	def clearAllTabs():
 		''' Clears all tabs
 		'''
-		sys.stdout.write(ScreenMethod.CLEAR_ALL_TABS)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.CLEAR_ALL_TABS)
 
 	@staticmethod
 	def eraseEndOfLine():
 		''' Erases from the current cursor position to the end of the current line
 		'''
-		sys.stdout.write(ScreenMethod.ERASE_END_OF_LINE)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.ERASE_END_OF_LINE, True)
 
 	@staticmethod
 	def eraseStartOfLine():
 		''' Erases from the current cursor position to the start of the current line
 		'''
-		sys.stdout.write(ScreenMethod.START_END_OF_LINE)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.ERASE_START_OF_LINE, True)
 
 	@staticmethod
 	def eraseLine():
 		''' Erases from the current line
 		'''
-		sys.stdout.write(ScreenMethod.ERASE_LINE)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.ERASE_LINE, True)
 
 	@staticmethod
 	def eraseDown():
 		''' Erase the screen from the current line down to the bottom of the screen
 		'''
-		sys.stdout.write(ScreenMethod.ERASE_DOWN)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.ERASE_DOWN, True)
 
 	@staticmethod
 	def eraseUp():
 		''' Erase the screen from the current line up to the top of the screen
 		'''
-		sys.stdout.write(ScreenMethod.ERASE_UP)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.ERASE_UP, True)
 
 	@staticmethod
 	def eraseScreen():
 		''' Erase the screen with background color and moves the cursor to home
 		'''
-		sys.stdout.write(ScreenMethod.ERASE_SCREEN)
-		sys.stdout.flush()
+		ScreenMethod._emit(ScreenMethod.ERASE_SCREEN, True)
 
 	@staticmethod
 	def write(text):
 		''' Write text to stdout, need to flush to force print
+		In batch mode, the text goes out with the batch
 		'''
-		sys.stdout.write(text)
+		ScreenMethod._screenSerial += 1
+		if ScreenMethod._batch is None:
+			sys.stdout.write(text)
+		else:
+			ScreenMethod._batch.append(text)
 
 	@staticmethod
 	def print(text):
 		''' Write text with line feed, need to flush to force print
 		'''
-		sys.stdout.write(text + '\n')
+		ScreenMethod.write(text + '\n')
 	
 	@staticmethod
 	def flush():
-		''' flush the stdout buffer 
+		''' flush the stdout buffer, nothing to do in batch mode as the 
+		batch is written out when it ends
 		'''
-		sys.stdout.flush()
+		if ScreenMethod._batch is None:
+			sys.stdout.flush()
 
 	@staticmethod
 	def deviceCode():
@@ -722,46 +906,83 @@ class ScreenMethod(object):
 		Query Cursor Position	<ESC>[6n
 		Report Cursor Position	<ESC>[{ROW};{COLUMN}R
 		
-		Return: [row, column] or [None, None] if fails
+		Return: (row, column) or (None, None) if fails
 		Example: row, column = ScreenMethod.cursorPosition()
 		'''
-		ret = [None, None]
+		ret = (None, None)
 		with ReadStream(10, 6, 0) as stream:
 			for _ in range(3):	# try 3 times
 				termios.tcflush(sys.stdin, termios.TCIFLUSH)
 				os.write(sys.stdout.fileno(), b'\x1b[6n')
 				key = stream.read()	# expects b'\x1b[xx;xxR'
-				if key[:2] == b'\x1b[' and key[-1:] == b'R' and ';' in key.decode():
-					ret = map(int, key[2:-1].decode().split(';'))
+				if key[:2] == b'\x1b[' and key[-1:] == b'R' and b';' in key:
+					row, column = key[2:-1].split(b';')
+					ret = (int(row), int(column))
 					break
 		return(ret)
 
+	@staticmethod
+	def _keyLength(keys):
+		''' Get the length of the first key stroke in keys
+		Known key sequences are matched through ReadStream.KEY_TRIE, the
+		others are split by the form of the sequence
+		Return: 0 if keys is empty or the key sequence is not complete
+		'''
+		node = ReadStream.KEY_TRIE
+		for i, byte in enumerate(keys):
+			node = node.get(byte)
+			if node is None:	# not a known key
+				break
+			if len(node) == 1 and None in node:	# nothing longer
+				return(i + 1)
+		else:
+			return(0)	# a known key so far, more is expected
+		if keys[0] != 0x1b:	# a character, may be in UTF-8
+			n = 1 if keys[0] < 0xc0 else (2 if keys[0] < 0xe0 else (3 if keys[0] < 0xf0 else 4))
+		elif len(keys) == 1:
+			return(0)
+		elif keys[1] == 0x5b:	# <ESC>[ ... ends with 0x40 to 0x7e
+			n = next((i + 1 for i in range(2, len(keys)) if 0x40 <= keys[i] <= 0x7e), 0)
+		elif keys[1] == 0x4f:	# <ESC>O{code}
+			n = 3
+		else:			# <ESC>{key}, ALT + key
+			n = 2
+		return(n if len(keys) >= n else 0)
+
 	@staticmethod
 	def getKey(blocking=True):
 		''' get key without waiting for line feed
 		Input:
 			It will run in blocking mode if 'blocking' is True, or
 			it will run in non-blocking mode if otherwise
-		Return: an integer 
+		Return: an integer, or 0 if no key is pressed in non-blocking mode
 		-	for ordinary character, ie 'a', it will return ord('a')
 		-	key stroke like KEY_F1(b'\x1bOP'), it will return as
 			(((0x1b << 8) + ord('O')) << 8) + ord('P')
+		It waits in select for input, and takes whatever is available
+		at once. Keys typed ahead or pasted are kept and returned one 
+		by one by the following calls.
 
 		Example:
 			key = ScreenMethod.getKey()
 			if key == 0x1b:
 				print('ESCAPE is pressed')
 		'''
-		mode = [6, 1, 0] if blocking else [6, 0, 1]
-		with ReadStream(*mode) as kb:
-			key = kb.read()
-			n = len(key)
-			r = struct.unpack('B' * n, key)
-			x = 0
-			for i in range(n):
-				x <<= 8
-				x += int(r[i])
-		return(x)
+		keys = ScreenMethod._keys
+		if not ScreenMethod._keyLength(keys):
+			with ReadStream(64, 0, 0) as kb:
+				# the rest of a key sequence read before is waited for 
+				# shortly, as it is after the first bytes of a key
+				timeout = 0.1 if keys or not blocking else None
+				while not ScreenMethod._keyLength(keys) and select.select([kb.stream], [], [], timeout)[0]:
+					data = kb.read()
+					if not data:
+						break
+					keys += data
+					timeout = 0.1	# the rest of a key sequence if any
+		n = ScreenMethod._keyLength(keys) or len(keys)
+		key, ScreenMethod._keys = keys[:n], keys[n:]
+		return(int.from_bytes(key, 'big'))
 
 class RichText(object):
 	''' a text structure to hold the raw text and its attributes and
@@ -778,31 +999,45 @@ class RichText(object):
 		text = rt.pack(2, 5)
 	All will give you the same result
 	'''
-	def __init__(self, text, attrs=[], row=0, column=0, reserv_setting=True):
+
+	# a pad may hold thousands of RichText, keep them small
+	__slots__ = ('text', 'attrs', 'row', 'column', 'reserv_setting', '_save_setting', '_attrs', '_position', '_restore_setting')
+
+	SGR_CACHE_SIZE = 256
+	_sgrCache = {}	# { tuple(attrs) : SGR escape sequence }, refer to _sgr
+
+	def __init__(self, text, attrs=(), row=0, column=0, reserv_setting=True):
 		self.text = text
 		self.attrs = attrs
 		self.row = row
 		self.column = column	
 		self.reserv_setting = reserv_setting	# preserv setting if set
-		''' Define attributes for use in _factory_format
+		''' Attributes for use in _factory_format are set when packing, 
+		not here, so that a RichText is cheap to create in a pad
 			A rich text will be formatted as:
-			{ self._save_setting }{ self._attrs }{ self._position }{ self._text }{ self._restore_setting }
+			{ self._save_setting }{ self._attrs }{ self._position }{ text }{ self._restore_setting }
+		refer to _factory_format
 		'''	
-		self._save_setting = ''
-		self._attrs = ''
-		self._position = ''
-		self._text = '{}'
-		self._restore_setting = ''
-		# define a string format for variable (row, column), refer to
-		# _factory_format
-		self._fmt = ''
+
+	@staticmethod
+	def _sgr(attrs):
+		''' Get the escape sequence to set attrs, which is formatted only
+		once for the same attrs and reused later on
+		'''
+		key = tuple(attrs)
+		sgr = RichText._sgrCache.get(key)
+		if sgr is None:
+			if len(RichText._sgrCache) >= RichText.SGR_CACHE_SIZE:
+				RichText._sgrCache.clear()
+			sgr = RichText._sgrCache[key] = ScreenMethod.fmt_SET_ATTRS % (';'.join(map(str, key)),)
+		return(sgr)
 
 	def _factory_attrs(self, attrs=None):
 		''' Factory text attrs
 		Return:	'' if attrs is empty
 		'''
 		attrs = self.attrs if attrs == None else attrs
-		self._attrs = ScreenMethod.var_SET_ATTRS.format(';'.join(str(x) for x in attrs)) if attrs else ''
+		self._attrs = RichText._sgr(attrs) if attrs else ''
 
 	def _factory_position(self, row=None, column=None, text=None):
 		''' Factory text position
@@ -811,7 +1046,7 @@ class RichText(object):
 		row = self.row if row == None else row
 		column = self.column if column == None else column
 		text = self.text if text == None else text
-		self._position = ScreenMethod.var_CURSOR_AT if row and column and text else ''
+		self._position = ScreenMethod._cursorAt(row, column) if row and column and text else ''
 
 	def _factory_reserv_setting(self):
 		''' Factory self._save_setting
@@ -824,32 +1059,21 @@ class RichText(object):
 		self._restore_setting = '' if not self.reserv_setting else (ScreenMethod.RESTORE_CURSOR_ATTRS if self._save_setting else (ScreenMethod.RESET_ATTRS if self._attrs else ''))
 
 	def _factory_format(self, row=None, column=None, text=None, attrs=None):
-		''' Factory string format using '{}{}{}{}{}'.format(
-				SAVE_CURSOR_ATTRS,
-				TEXT_ATTRS,
-				VAR_CURSOR_AT,
-				text,
+		''' Factory the pieces of a rich text, which is
+				SAVE_CURSOR_ATTRS
+				TEXT_ATTRS
+				CURSOR_AT (row, column)
+				text
 				RESTORE_CURSOR_ATTRS
-			)
-		where:
-		-	var_CURSOR_AT('\x1b[{};{}f') expects (row, column)
-		-	fill {text} with '{}' and expects real 'text'
 		Output:
-		- 	save the result into self._fmt, which is a string 
-			format, which expects (row, column, text):
-				self._fmt.format(row, column, text)	
-		-	call self.out(row, column) to get the ultimate richText
+		- 	save them into self._save_setting, self._attrs, 
+			self._position and self._restore_setting, where the 
+			position is formatted already
+		-	call self.pack(row, column) to get the ultimate richText
 		'''
 		self._factory_attrs(attrs)
 		self._factory_position(row, column, text)
 		self._factory_reserv_setting()
-		self._fmt = '{}{}{}{}{}'.format(
-			self._save_setting, 
-			self._attrs,
-			self._position,
-			'{}',
-			self._restore_setting
-		)
 
 	def __str__(self):
 		''' Generate rich text at preset position and attrs
@@ -869,10 +1093,8 @@ class RichText(object):
 		and move the text on screen 
 		'''
 		self._factory_format(row, column, text, attrs)
-		row = self.row if row == None else row
-		column = self.column if column == None else column
 		text = self.text if text == None else text
-		return(self._fmt.format(row, column, text) if row and column else self._fmt.format(text))
+		return(self._save_setting + self._attrs + self._position + text + self._restore_setting)
 
 class TextScreen(object):
 	''' A text screen which supports line by line print, no positional 
@@ -893,10 +1115,13 @@ class TextScreen(object):
 	def __init__(self):
 		self.rows = 0		# screen size
 		self.columns = 0
-		self.buffer = {}	# { row : coloredText, ... }
+		self.buffer = []	# [ coloredText of row 1, ... ], None if no text
 		self.currentRow = 1	# current row for input
 		self.beginRow = 1	# where to start display, pad begins
 		self.depth = self.TEXT_ROWS	# rows to display, pad depth
+		self._front = None	# (rows, columns, lines) on screen, refer to flush
+		self._frontSerial = None	# ScreenMethod._screenSerial of _front
+		self._rowPrefix = []	# [ position + erase of row 1, ... ], refer to _redraw
 		self.setSize()			
 		self.newScreen()
 		self._savedTerm = ScreenMethod.getTermAttrs()
@@ -925,7 +1150,7 @@ class TextScreen(object):
 	def newScreen(self):
 		''' clear screen buffer
 		'''
-		self.buffer = {}
+		self.buffer = []
 		self.beginRow = 1
 		self.currentRow = 1
 
@@ -944,21 +1169,34 @@ class TextScreen(object):
 		'''
 		self.depth = depth if depth and depth > 0 else self.TEXT_ROWS
 
+	def _rowIndex(self):
+		''' Get index of self.currentRow in self.buffer, which is extended
+		to hold the row if necessary
+		'''
+		i = self.currentRow - 1
+		if i >= len(self.buffer):
+			self.buffer.extend([None] * (i + 1 - len(self.buffer)))
+		return(i)
+
 	def newLine(self):
 		''' Set self.currentRow to next line
 		'''
-		if self.currentRow not in self.buffer:
-			self.buffer[self.currentRow] = ''
+		i = self._rowIndex()
+		if self.buffer[i] is None:
+			self.buffer[i] = ''
 		self.currentRow += 1
 
 	def write(self, text, attrs=None, reserv_setting=True):
 		''' Write text to screen buffer, either plain or colored text
 		'''
-		rt = str(RichText(text, attrs, 0, 0, reserv_setting))
-		if self.currentRow in self.buffer:
-			self.buffer[self.currentRow] += rt
+		# the same as str(RichText(text, attrs, 0, 0, reserv_setting)),
+		# a text without position needs no RichText
+		if attrs:
+			rt = RichText._sgr(attrs) + text + (ScreenMethod.RESET_ATTRS if reserv_setting else '')
 		else:
-			self.buffer[self.currentRow] = rt
+			rt = text
+		i = self._rowIndex()
+		self.buffer[i] = rt if self.buffer[i] is None else self.buffer[i] + rt
 
 	def print(self, text, attrs=None, reserv_setting=True):
 		''' Write text to screen buffer and new line
@@ -966,15 +1204,64 @@ class TextScreen(object):
 		self.write(text, attrs, reserv_setting)
 		self.newLine()
 
-	def flush(self):
-		''' Clear the screen and print content (self.buffer) to screen
+	def _isPlain(self, line):
+		''' Check if a line takes exactly one screen row and leaves no
+		attrs set, so that it can be redrawn alone
+		'''
+		i = line.rfind('\x1b')
+		return(len(line) <= self.columns and line.isascii() and '\n' not in line and (i < 0 or line.startswith(ScreenMethod.RESET_ATTRS, i)))
+
+	def _redraw(self, lines, endLine):
+		''' Get the text to turn the screen of _front into lines, only
+		changed rows are rewritten. The cursor ends where a full redraw
+		leaves it, refer to flush
+		'''
+		old = self._front[2]
+		n = len(lines)
+		prefix = self._rowPrefix
+		if len(prefix) < max(n, len(old)):	# made once for all frames
+			prefix.extend(ScreenMethod._cursorAt(row, 1) + ScreenMethod.ERASE_END_OF_LINE for row in range(len(prefix) + 1, max(n, len(old)) + 1))
+		out = prefix[n:len(old)]
+		append = out.append
+		last = False	# the last line is the last one written
+		for i, line in enumerate(lines):
+			if i >= len(old) or line != old[i]:
+				append(prefix[i] + line)
+				last = i == n - 1
+		if endLine:
+			append(ScreenMethod._cursorAt(n + 1, 1))
+		elif not lines:
+			append(ScreenMethod.CURSOR_HOME)
+		elif not last:
+			append(ScreenMethod._cursorAt(n, 1) + lines[-1])
+		return(''.join(out))
+
+	def flush(self, force=False):
+		''' Print content (self.buffer) to screen. The screen is cleared and
+		printed all over, or only the changed rows are rewritten if the 
+		screen is known to be the same as the last flush left it
+		force: clear and print all over, ie. after something is written
+		to the terminal other than by ScreenMethod
 		'''
-		ScreenMethod.clearScreen()
 		# make sure it won't go beyond display area or screen
 		lastRow = self.beginRow + min(self.depth, self.rows) - 1	
-		for l in sorted(filter(lambda x: x >= self.beginRow and x <= lastRow, self.buffer.keys())):
-			sys.stdout.write(self.buffer[l] + ('\n' if l < lastRow else ''))
-		sys.stdout.flush()
+		lines = [l for l in self.buffer[self.beginRow - 1:lastRow] if l is not None]
+		endLine = bool(lines) and (len(self.buffer) < lastRow or self.buffer[lastRow - 1] is None)	# end it by '\n'
+		front = self._front
+		plain = all(map(self._isPlain, lines))
+		if plain and not force and front is not None and self._frontSerial == ScreenMethod._screenSerial and front[:2] == (self.rows, self.columns):
+			text = self._redraw(lines, endLine)
+		else:
+			# clear screen and print the content by one write, built by one
+			# join so that the text is not copied again for prefix or suffix.
+			# attrs left by earlier output are reset so that the rows are
+			# drawn the same as when they are rewritten one by one
+			text = ScreenMethod.RESET_ATTRS + ScreenMethod.ERASE_SCREEN + ScreenMethod.CURSOR_HOME
+			if lines:
+				text = '\n'.join([text + lines[0]] + lines[1:] + ([''] if endLine else []))
+		ScreenMethod._emit(text, True)
+		self._front = (self.rows, self.columns, lines) if plain else None
+		self._frontSerial = ScreenMethod._screenSerial
 			
 class TextWindow(object):
 	''' A text window, which reflects a physical area of a screen, which 
@@ -994,6 +1281,10 @@ class TextWindow(object):
 		tw.moveWindow(10,10)
 	'''
 
+	# a text in the buffer at (row, column) of the window with attrs in a
+	# tuple, lighter than a RichText as the buffer is refilled on redraw
+	_Entry = collections.namedtuple('_Entry', ('text', 'attrs', 'row', 'column'))
+
 	def __init__(self, rows=None, columns=None, beginRow=None, beginColumn=None):
 		self.screen = TextScreen()
 		self.rows = self.screen.rows	# window size
@@ -1004,7 +1295,16 @@ class TextWindow(object):
 		self.cursorColumn = 1
 		self.savedCursorRow = 1	# saved cursor position in window
 		self.savedCursorColumn = 1
-		self.buffer = []	# Output buffer, list of RichText 
+		self.buffer = []	# Output buffer, list of _Entry
+		# what is on screen since last flush: the window position and 
+		# the texts, attrs, rows and columns of the buffer, one tuple each
+		self._front = (None, (), (), (), ())
+		self._frontSerial = None	# ScreenMethod._screenSerial of _front
+		# rows drawn on since the window was cleared, None if unknown
+		self._dirtyRows = None
+		self._clearKey = None	# window and screen geometry of _clearRows
+		self._clearRows = []	# blank text of each window row, refer to clearWindow
+		self._clearAll = ''	# the blank texts of all rows joined
 		self.newWindow(rows, columns, beginRow, beginColumn)
 
 	def setSize(self, rows, columns):
@@ -1013,15 +1313,16 @@ class TextWindow(object):
 		the window will be moved to the top left corner. 
 		'''
 		if not rows or not columns or rows < 1 or columns < 1 or rows > self.screen.rows or columns > self.screen.columns:
-			syslog.syslog(syslog.LOG_INFO, 'TextWindow.setSize out of screen')
+			_log.info('TextWindow.setSize out of screen')
 			return(False)
 		if self.rows == rows and self.columns == columns:
 			return(True)	# no change at all
 		self.newBuffer()
 		self.rows = rows
 		self.columns = columns
+		self._dirtyRows = None
 		if not self.setPos(self.beginRow, self.beginColumn):
-			syslog.syslog(syslog.LOG_INFO, 'TextWindow.setSize.setPos out of screen')
+			_log.info('TextWindow.setSize.setPos out of screen')
 			self.setPos(1,1)	# move to the top left corner 
 		return(True)
 	
@@ -1030,8 +1331,10 @@ class TextWindow(object):
 		will do health check against the defined window size
 		'''
 		if not beginRow or not beginColumn or beginRow < 1 or beginColumn < 1 or beginRow + self.rows - 1 > self.screen.rows or beginColumn + self.columns - 1 > self.screen.columns:
-			syslog.syslog(syslog.LOG_INFO, 'TextWindow.setPos out of screen')
+			_log.info('TextWindow.setPos out of screen')
 			return(False)
+		if beginRow != self.beginRow or beginColumn != self.beginColumn:
+			self._dirtyRows = None	# a new area of screen
 		self.beginRow = beginRow
 		self.beginColumn = beginColumn
 		return(True)
@@ -1054,9 +1357,9 @@ class TextWindow(object):
 		which is n characters in length
 		if line_feed is set, it will new a line at the end
 		'''
-		if row and row > 0 and row <= self.rows:
+		if row and 0 < row <= self.rows:
 			self.cursorRow = row 
-		if column and column > 0 and column <= self.columns:
+		if column and 0 < column <= self.columns:
 			self.cursorColumn = column 
 		if n:
 			self.cursorColumn += n
@@ -1080,7 +1383,7 @@ class TextWindow(object):
 	def newBuffer(self):
 		''' New window display buffer and clear old data
 		'''
-		self.buffer = []
+		self.buffer.clear()	# keep the list, it is filled up again soon
 		self.cursorHome()
 
 	def newWindow(self, rows=None, columns=None, beginRow=None, beginColumn=None):
@@ -1094,22 +1397,42 @@ class TextWindow(object):
 		if self.setPos(beginRow, beginColumn):
 			self.flush()	
 		else:
-			syslog.syslog(syslog.LOG_INFO, 'TextWindow.moveWindow out of screen')
+			_log.info('TextWindow.moveWindow out of screen')
 
 	def clearWindow(self):
 		''' Clear the display window
+		Only the rows drawn on since last clear are cleared if nothing 
+		else is written to screen since then
 		'''
 		if not self.screen.resized() or (self.beginRow <= self.screen.rows and self.beginColumn <= self.screen.columns):
-			text = ' ' * min(self.columns, self.screen.columns - self.beginColumn + 1)
-			attrs = [ ScreenMethod.ATTR_RESET ]
-			endRow = self.beginRow - 1 + min(self.rows, self.screen.rows - self.beginRow + 1)
-			row = self.beginRow
-			while row <= endRow:
-				sys.stdout.write(str(RichText(text, attrs, row, self.beginColumn)))
-				row += 1	
-			sys.stdout.flush()
-
-	def write(self, text, row=0, column=0, attrs=[], line_feed=False):
+			# the blank rows only change with the window or screen geometry
+			key = (self.beginRow, self.beginColumn, self.rows, self.columns, self.screen.rows, self.screen.columns)
+			if key != self._clearKey:
+				text = ' ' * min(self.columns, self.screen.columns - self.beginColumn + 1)
+				sgr = RichText._sgr((ScreenMethod.ATTR_RESET,))
+				endRow = self.beginRow - 1 + min(self.rows, self.screen.rows - self.beginRow + 1)
+				rows = range(self.beginRow, endRow + 1)
+				# packed as RichText(text, [ATTR_RESET], row, beginColumn)
+				if text:
+					head = ScreenMethod.SAVE_CURSOR_ATTRS + sgr
+					tail = text + ScreenMethod.RESTORE_CURSOR_ATTRS
+					self._clearRows = [head + ScreenMethod._cursorAt(row, self.beginColumn) + tail for row in rows]
+				else:
+					self._clearRows = [sgr + ScreenMethod.RESET_ATTRS for row in rows]
+				self._clearAll = ''.join(self._clearRows)
+				self._clearKey = key
+			# all rows by one write
+			if self._dirtyRows is not None and self._frontSerial == ScreenMethod._screenSerial:
+				n = len(self._clearRows)
+				ScreenMethod._emit(''.join([self._clearRows[r - 1] for r in sorted(self._dirtyRows) if r <= n]), True)
+			else:
+				ScreenMethod._emit(self._clearAll, True)
+			# the window is blank now
+			self._front = ((self.beginRow, self.beginColumn, self.screen.rows, self.screen.columns), (), (), (), ())
+			self._frontSerial = ScreenMethod._screenSerial
+			self._dirtyRows = set()
+
+	def write(self, text, row=0, column=0, attrs=(), line_feed=False):
 		''' write text to RichText to display in the window later
 		- no auto line wrap supported, text is cut if out of boundary
 		- \n or \r or other speical terminal control characters or 
@@ -1123,28 +1446,89 @@ class TextWindow(object):
 		rrow = row if row and row > 0 else self.cursorRow
 		rcolumn = column if column and column > 0 else self.cursorColumn
 		if rrow > self.rows or rcolumn > self.columns:
-			syslog.syslog(syslog.LOG_INFO, 'TextWindow.write out of window')
+			_log.info('TextWindow.write out of window at (%s, %s)', rrow, rcolumn)
 			return(False)	# out of window
-		width = min(len(text), self.columns - rcolumn + 1)
-		self.moveCursor(rrow, rcolumn, width, line_feed)
-		self.buffer.append(RichText(text[0:width], attrs, rrow, rcolumn))
+		width = self.columns - rcolumn + 1
+		if len(text) > width:
+			text = text[:width]
+		# (rrow, rcolumn) is in the window, as moveCursor would check
+		self.cursorRow = rrow
+		self.cursorColumn = rcolumn + len(text)
+		if self.cursorColumn > self.columns or line_feed:
+			self.newLine()
+		self.buffer.append(TextWindow._Entry._make((text, tuple(attrs) if attrs else (), rrow, rcolumn)))
 		return(True)
 
-	def print(self, text, row=0, column=0, attrs=[]):
+	def print(self, text, row=0, column=0, attrs=()):
 		''' write with line_feed
 		'''
 		return(self.write(text, row, column, attrs, True))
 
-	def flush(self):
-		''' display content (RichText) on screen
+	def _pack(self, buffer):
+		''' Pack texts in buffer at their position on screen, where
+		consecutive texts in buffer of the same attrs share one pair of 
+		save/restore setting and one attrs setting, even if they are on
+		different screen rows
+		'''
+		# it runs for every text on every flush, keep lookups out of the loop
+		parts = []
+		append = parts.append
+		cursorAt = ScreenMethod._cursorAt
+		save = ScreenMethod.SAVE_CURSOR_ATTRS
+		restore = ScreenMethod.RESTORE_CURSOR_ATTRS
+		rowOffset = self.beginRow - 1
+		columnOffset = self.beginColumn - 1
+		attrs = None	# attrs of the current run of texts, None if no run
+		for rt in buffer:
+			if not rt.text:	# as RichText packs it, attrs but no position
+				if attrs is not None:
+					append(restore)
+					attrs = None
+				if rt.attrs:
+					append(RichText._sgr(rt.attrs) + ScreenMethod.RESET_ATTRS)
+				continue
+			if rt.attrs != attrs:
+				if attrs is not None:
+					append(restore)
+				attrs = rt.attrs
+				append(save + RichText._sgr(attrs) if attrs else save)
+			append(cursorAt(rowOffset + rt.row, columnOffset + rt.column) + rt.text)
+		if attrs is not None:
+			append(restore)
+		return(''.join(parts))
+
+	def flush(self, force=False):
+		''' display content (self.buffer) on screen
+		If nothing else is written to screen since last flush, the window
+		and screen size stay the same and the buffer only grows since 
+		then, just display the newly added ones
+		force: display all of the buffer, ie. after something is written 
+		to the terminal other than by ScreenMethod
 		'''
 		if self.screen.resized() and (self.beginRow + self.rows - 1 > self.screen.rows or self.beginColumn + self.columns - 1 > self.screen.columns):
 			# Do nothing if window is out of screen
-			syslog.syslog(syslog.LOG_INFO, 'TextWindow.flush out of screen')
+			_log.info('TextWindow.flush out of screen')
 		else:
-			for rt in self.buffer:
-				sys.stdout.write(rt.pack(self.beginRow + rt.row - 1, self.beginColumn + rt.column - 1))
-			sys.stdout.flush()
+			# the window and screen geometry, then the texts, attrs, rows
+			# and columns of the buffer, one tuple each, taken apart by zip
+			# in one pass as entries are tuples
+			frame = ((self.beginRow, self.beginColumn, self.screen.rows, self.screen.columns),) + (tuple(zip(*self.buffer)) if self.buffer else ((), (), (), ()))
+			# compare tuple by tuple, so no packing is needed to find out 
+			# how many of them are on screen already
+			n = len(self._front[1])
+			known = not force and self._frontSerial == ScreenMethod._screenSerial and frame[0] == self._front[0]
+			if not known or any(new[:n] != old for new, old in zip(frame[1:], self._front[1:])):
+				n = 0
+			text = self._pack(self.buffer[n:])
+			if text:
+				# it may cover other windows
+				ScreenMethod._emit(text, True)
+			if not known:
+				self._dirtyRows = None
+			elif self._dirtyRows is not None:
+				self._dirtyRows.update(frame[3][n:])
+			self._front = frame
+			self._frontSerial = ScreenMethod._screenSerial
 
 class TextPad(object):
 	''' Textpad which can be bigger than physical screen
@@ -1173,8 +1557,13 @@ class TextPad(object):
 	# default pad size 
 	PAD_ROWS = 8192
 	PAD_COLUMNS = 512
+	PAGE_CACHE_SIZE = 16	# pages to keep their display buffer
 
-	def __init__(self, rows=0, columns=0, win_rows=0, win_columns=0, win_begin_row=1, win_begin_column=1, display_begin_row=1, display_begin_column=1):
+	def __init__(self, rows=0, columns=0, win_rows=0, win_columns=0, win_begin_row=1, win_begin_column=1, display_begin_row=1, display_begin_column=1, keep_history=True):
+		''' keep_history: keep texts written out of the display window, 
+		so that they can be shown by movePad or another page later. 
+		If not set, such texts are dropped when written
+		'''
 		self.window = TextWindow(win_rows, win_columns, win_begin_row, win_begin_column) 			# Text window to display
 		self.rows = 0 		# pad size 
 		self.columns = 0
@@ -1189,7 +1578,10 @@ class TextPad(object):
 		self._items_per_page = None	# for pagination purpose
 		self.lineWrap = True	# default line autowrap enabled
 		self.buffer = []	# pad content, list of RichText
+		self._rowItems = {}	# { row : [index in self.buffer, ...] }, refer to flush
 		self.fullScreen = False
+		self.keepHistory = keep_history
+		self._pageCache = {}	# window buffer of displayed pages, refer to flush
 		self.newPad(rows, columns)
 		self.setDisplayPos(display_begin_row, display_begin_column)
 
@@ -1221,9 +1613,9 @@ class TextPad(object):
 		which is n characters in length
 		if line_feed is set, it will new a line at the end
 		'''
-		if row and row > 0 and row <= self.rows:
+		if row and 0 < row <= self.rows:
 			self.cursorRow = row 
-		if column and column > 0 and column <= self.columns:
+		if column and 0 < column <= self.columns:
 			self.cursorColumn = column 
 		if n:
 			self.cursorColumn += n
@@ -1281,7 +1673,9 @@ class TextPad(object):
 		''' New pad content and clear old data
 		'''
 		self.buffer = []
+		self._rowItems = {}
 		self._max_rows = 0
+		self._pageCache.clear()
 		self.cursorHome()
 		self.window.newBuffer()
 		self.clearWindow()
@@ -1306,9 +1700,9 @@ class TextPad(object):
 				self.page.setItemsPerPage(self.window.rows)
 			self.flush()	
 		else:
-			syslog.syslog(syslog.LOG_INFO, 'TextPad.resizeWindow out of screen')
+			_log.info('TextPad.resizeWindow out of screen')
 
-	def write(self, text, row=0, column=0, attrs=[], line_feed=False):
+	def write(self, text, row=0, column=0, attrs=(), line_feed=False):
 		''' Write text to pad, no \n and/or \r is expected
 		(row, column) is relative position in pad
 		(0,0) means writing to current cursor position
@@ -1318,49 +1712,125 @@ class TextPad(object):
 		rrow = row if row and row > 0 else self.cursorRow
 		rcolumn = column if column and column > 0 else self.cursorColumn
 		if rrow > self.rows or rcolumn > self.columns:
-			syslog.syslog(syslog.LOG_INFO, 'TextPad.write out of pad')
+			_log.info('TextPad.write out of pad at (%s, %s)', rrow, rcolumn)
 			return(False)
-		self._updateMaxRows(rrow)
+		attrs = tuple(attrs) if attrs else ()	# shared by the lines, and the window
+		# (rrow, rcolumn) is the cursor from here on, and it is checked 
+		# once per line, so keep lookups out of the loop
+		rows = self.rows
+		columns = self.columns
+		buffer = self.buffer
+		rowItems = self._rowItems
+		keepHistory = self.keepHistory
+		added = False
 		tl = len(text)
-		l = min(tl, self.columns - rcolumn + 1)
-		self.buffer.append(RichText(text[0:l], attrs, rrow, rcolumn))
-		self.moveCursor(rrow, rcolumn, l, line_feed)
-		if self.lineWrap and tl > l:
-			self.write(text[l:], 0, 0, attrs)
+		i = 0	# where in text the line begins
+		while True:
+			if rrow > self._max_rows:
+				self._updateMaxRows(rrow)
+			l = min(tl - i, columns - rcolumn + 1)
+			if keepHistory or self._isVisible(rrow, rcolumn, l):
+				rowItems.setdefault(rrow, []).append(len(buffer))
+				buffer.append(RichText(text[i:i + l], attrs, rrow, rcolumn))
+				added = True
+			# move on as newLine would at the end of the line
+			rcolumn += l
+			if rcolumn > columns or line_feed:
+				rrow += 1
+				rcolumn = 1
+			i += l
+			if not self.lineWrap or i >= tl:
+				break
+			# wrap the rest to the cursor, line_feed is for the first line only
+			line_feed = False
+			if rrow > rows or rcolumn > columns:
+				_log.info('TextPad.write out of pad at (%s, %s)', rrow, rcolumn)
+				break
+		self.cursorRow = rrow
+		self.cursorColumn = rcolumn
+		if added:
+			self._pageCache.clear()
 		return(True)
 
-	def print(self, text, row=0, column=0, attrs=[]):
+	def print(self, text, row=0, column=0, attrs=()):
 		''' write with line_feed
 		'''
 		return(self.write(text, row, column, attrs, True))
 
-	def flush(self):
+	def _isVisible(self, row, column, n):
+		''' check if a text of n characters at (row, column) in pad is in 
+		the display window now
+		'''
+		first = self.beginRow + ((self.page._current_page - 1) * self.page._items_per_page if self.page else 0)
+		rows = self.page._items_per_page if self.page else self.window.rows
+		return(first <= row < first + rows and column < self.beginColumn + self.window.columns and column + n > self.beginColumn)
+
+	def flush(self, force=False):
 		''' Refresh the content to the display window for display
+		force: redisplay all of it, refer to TextWindow.flush
 		'''
 		if self.fullScreen:
 			# check and update the window size if necessary
 			self.window.setSize(*ScreenMethod.getSize())
-		self.window.newBuffer()
-		for rt in self.buffer:
-			self._writeWindowBuffer(rt)
-		self.window.flush()
-
-	def _writeWindowBuffer(self, rt):
-		''' write RichText to window's buffer, inrternal use only
-		'''
-		delta = (self.page._current_page - 1) * self.page._items_per_page if self.page else 0
-		if not rt or rt.row < self.beginRow + delta or (self.page and rt.row >= self.beginRow + delta + self.page._items_per_page): 	# no show
-			return
-		row = rt.row - self.beginRow - delta + 1
-		if rt.column >= self.beginColumn:
-			column = rt.column - self.beginColumn + 1 
+		# a page (or pad area) shown before is taken from the cache 
+		# instead of walking through the whole pad again
+		key = (self.page._current_page, self.page._items_per_page) if self.page else (0, 0)
+		key += (self.beginRow, self.beginColumn, self.window.rows, self.window.columns)
+		cached = self._pageCache.get(key)
+		if cached:
+			self.window.buffer[:] = cached[0]
+			self.window.cursorRow, self.window.cursorColumn = cached[1:]
+		else:
+			self.window.newBuffer()
+			# only the texts in the rows on display are looked at, in the
+			# order they are written to the pad
+			first = self.beginRow + ((self.page._current_page - 1) * self.page._items_per_page if self.page else 0)
+			rows = self.page._items_per_page if self.page else self.window.rows
+			items = []
+			for row in range(first, first + rows):
+				items.extend(self._rowItems.get(row, ()))
+			items.sort()
+			buffer = self.buffer
+			self._writeWindowBuffer([buffer[i] for i in items], first)
+			if len(self._pageCache) >= self.PAGE_CACHE_SIZE:
+				del self._pageCache[next(iter(self._pageCache))]	# the oldest
+			self._pageCache[key] = (list(self.window.buffer), self.window.cursorRow, self.window.cursorColumn)
+		self.window.flush(force)
+
+	def _writeWindowBuffer(self, items, first):
+		''' write RichText's in the rows on display, which begin at pad
+		row first, to window's buffer, inrternal use only
+		'''
+		# it runs for every text on display, so the texts are cut and put
+		# into the buffer right here, as self.window.write would do one by
+		# one, and the cursor is left where the last write would leave it
+		window = self.window
+		rows = window.rows
+		columns = window.columns
+		entry = TextWindow._Entry._make
+		append = window.buffer.append
+		rowOffset = first - 1
+		columnOffset = self.beginColumn - 1
+		cursor = None
+		for rt in items:
+			row = rt.row - rowOffset
+			column = rt.column - columnOffset
 			text = rt.text
-			self.window.write(text, row, column, rt.attrs)
-		elif len(rt.text) + rt.column > self.beginColumn:
-			column = 1
-			s = self.beginColumn - rt.column
-			text = rt.text[s:]
-			self.window.write(text, row, column, rt.attrs)
+			if column < 1:	# it begins on the left of the window
+				if len(text) < 2 - column:
+					continue
+				text = text[1 - column:]
+				column = 1
+			if row > rows or column > columns:
+				continue	# out of window
+			if len(text) > columns - column + 1:
+				text = text[:columns - column + 1]
+			append(entry((text, tuple(rt.attrs) if rt.attrs else (), row, column)))
+			cursor = (row, column + len(text))
+		if cursor:
+			window.cursorRow, window.cursorColumn = cursor
+			if window.cursorColumn > columns:
+				window.newLine()
 
 	def _updateMaxRows(self, row):
 		''' keep a record of the maximum row number used, this 